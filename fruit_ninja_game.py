@@ -5,6 +5,9 @@ import time
 import random
 import os # Import os for path joining
 import json # Import json for high scores
+import threading # Present stage runs on its own thread
+import queue # Key events from the present stage back to the game loop
+from collections import deque # Bounded buffers for latency samples
 
 # Initialize MediaPipe Hands - Allow two hands, adjust confidences
 mp_hands = mp.solutions.hands
@@ -32,12 +35,24 @@ MAX_HIGH_SCORES = 5 # Number of scores to keep per category
 TIME_OPTIONS = {30: '1', 60: '2'} # Reduced time options (Key: duration, Value: display char)
 KEY_TO_DURATION = {ord(v): k for k, v in TIME_OPTIONS.items()} # Map key code to duration
 MAX_NAME_LENGTH = 10 # Max characters for high score name
+WINDOW_NAME = 'VibeBoxing Target Practice'
+DISPLAY_REFRESH_HZ = 60 # Present stage paces imshow to this rate
+NO_KEY = 0xFF # cv2.waitKey() & 0xFF when no key was pressed
+# Set VIBEBOXING_TARGET_SEED to replay the same target positions every round (benchmarks, tournaments)
+TARGET_SEED_ENV = 'VIBEBOXING_TARGET_SEED'
+TARGET_SEED = None # Fixed seed parsed from TARGET_SEED_ENV; None picks a fresh seed each round
+if os.environ.get(TARGET_SEED_ENV):
+    try:
+        TARGET_SEED = int(os.environ[TARGET_SEED_ENV])
+    except ValueError:
+        print(f"Warning: {TARGET_SEED_ENV} must be an integer, got '{os.environ[TARGET_SEED_ENV]}'. Using random seeds.")
+MAX_HITS_PER_SECOND = 60 # Generous cap that sizes the target schedule (move_target wraps around it anyway)
 
 # --- Game Variables ---
 current_state = STATE_TITLE_SCREEN # Start at title screen
 punch_count = 0
 selected_duration = 0
-start_time = 0
+start_time = None # Capture timestamp of the round's first frame, set once the round is running
 remaining_time = 0
 final_score = 0
 high_scores = {} # Loaded at start, format: {"30": [{"name": "ABC", "score": 10}, ...], "60": [...]}
@@ -48,6 +63,9 @@ target_damage_stage = 1 # Current face stage (1-6)
 
 # Target variables
 target_rect = None
+target_schedule = [] # Pre-generated (x, y) positions for the current round
+target_schedule_index = 0 # Next position to use from target_schedule
+round_seed = None # Seed target_schedule was generated from (shown on results so a round can be replayed)
 target_size = 260 # Increased target size significantly
 hit_display_duration = 0.3 # Keep for potential future use?
 
@@ -56,7 +74,7 @@ hit_display_duration = 0.3 # Keep for potential future use?
 # line_color = (0, 255, 255)
 # punch_line_color = (255, 255, 255)
 
-last_punch_time = [0, 0]
+last_punch_time = [float('-inf'), float('-inf')] # Capture timestamps (time.monotonic) of last hit per hand
 punch_cooldown = 0.2 # Restore cooldown to prevent counts when speed check is off
 min_punch_speed = 8   # Lowered speed threshold further
 
@@ -67,6 +85,16 @@ fist_visual_radius = 70 # Radius of the blue circle for visualization
 fist_collision_radius = fist_visual_radius + 20 # Larger radius for hit detection
 glove_size = 280 # Increased display size for glove images
 
+# --- Latency Tracking ---
+# All timestamps below come from time.monotonic(), taken by the capture stage right after
+# cap.grab() returns and before the frame is decoded (the grab thread is always waiting
+# in grab(), so frames never sit in the driver buffer behind slow processing)
+frame_capture_time = 0.0 # Capture timestamp of the frame currently being processed
+LATENCY_SAMPLE_LIMIT = 2000 # Keep only the most recent samples per metric
+capture_to_hit_latencies = deque(maxlen=LATENCY_SAMPLE_LIMIT) # Seconds from capture to hit being counted
+capture_to_display_latencies = deque(maxlen=LATENCY_SAMPLE_LIMIT) # Seconds from capture to frame handed to imshow
+# Both buffers hold the current (or last finished) round only; cleared when a round starts
+
 # --- Load Assets ---
 left_glove_img = cv2.imread(os.path.join('assets', 'leftglove.png'), cv2.IMREAD_UNCHANGED)
 right_glove_img = cv2.imread(os.path.join('assets', 'rightglove.png'), cv2.IMREAD_UNCHANGED)
@@ -126,6 +154,31 @@ if target_face_images[0] is None:
     print("CRITICAL ERROR: Base target image Face1.png failed to load. Exiting.")
     exit()
 
+def build_face_atlas(face_images):
+    """Packs the damage-stage faces into premultiplied sprite arrays.
+
+    Missing stages reuse the closest earlier face, so drawing a stage is a plain
+    index. Returns (color, alpha_inv): color is (stages, h, w, 3) BGR already
+    multiplied by alpha, alpha_inv is (stages, h, w, 1) holding 1 - alpha.
+    Faces without an alpha channel are treated as fully opaque.
+    """
+    resolved = []
+    for img in face_images:
+        resolved.append(img if img is not None else resolved[-1])
+    color_layers = []
+    alpha_layers = []
+    for img in resolved:
+        bgr = img[:, :, :3].astype(np.float32)
+        if img.shape[2] >= 4:
+            alpha = img[:, :, 3:4].astype(np.float32) / 255.0
+        else:
+            alpha = np.ones(bgr.shape[:2] + (1,), dtype=np.float32)
+        color_layers.append(bgr * alpha)
+        alpha_layers.append(1.0 - alpha)
+    return np.stack(color_layers), np.stack(alpha_layers)
+
+face_atlas_color, face_atlas_alpha_inv = build_face_atlas(target_face_images)
+
 # --- Load/Save High Scores (Modified for List Structure) ---
 def load_high_scores():
     """Loads high scores (list of dicts) from the JSON file."""
@@ -176,6 +229,132 @@ def save_high_scores(scores):
     except IOError as e:
         print(f"Error saving high scores: {e}")
 
+# --- Latency Reporting ---
+def record_latency(samples, capture_time):
+    """Stores the time elapsed since capture_time in the given sample buffer."""
+    samples.append(time.monotonic() - capture_time)
+
+def report_latency(label, samples):
+    """Prints p50/p90/p99/max of a latency sample buffer in milliseconds."""
+    if not samples:
+        print(f"{label}: no samples")
+        return
+    values_ms = np.array(samples) * 1000.0
+    p50, p90, p99 = np.percentile(values_ms, [50, 90, 99])
+    print(f"{label} ({len(values_ms)} samples): p50 {p50:.1f}ms, p90 {p90:.1f}ms, "
+          f"p99 {p99:.1f}ms, max {values_ms.max():.1f}ms")
+
+def report_all_latencies():
+    report_latency("Capture-to-hit latency", capture_to_hit_latencies)
+    report_latency("Capture-to-display latency", capture_to_display_latencies)
+
+# --- Capture Stage ---
+# A grab thread reads the camera continuously and keeps only the newest frame, stamped
+# on arrival. The game loop always works on the latest frame instead of a backlog.
+capture_cond = threading.Condition()
+latest_capture = None # Newest (frame, capture_time, sequence number) from the camera
+capture_stop = threading.Event()
+
+def capture_loop():
+    """Reads frames as fast as the camera delivers them, replacing the previous one."""
+    global latest_capture
+    sequence = 0
+    while not capture_stop.is_set():
+        # Stamp between grab and retrieve so decode time counts towards measured latency
+        if not cap.grab():
+            print("Ignoring empty camera frame.")
+            continue
+        capture_time = time.monotonic()
+        success, frame = cap.retrieve()
+        if not success:
+            print("Ignoring empty camera frame.")
+            continue
+        sequence += 1
+        with capture_cond:
+            latest_capture = (frame, capture_time, sequence)
+            capture_cond.notify_all()
+
+def next_capture(last_sequence, timeout=1.0):
+    """Waits for a frame newer than last_sequence. Returns None on timeout."""
+    with capture_cond:
+        capture_cond.wait_for(lambda: latest_capture is not None and latest_capture[2] != last_sequence, timeout)
+        if latest_capture is None or latest_capture[2] == last_sequence:
+            return None
+        return latest_capture
+
+# --- Present Stage ---
+# The game loop (on a worker thread) hands finished frames to a one-slot mailbox; the
+# main thread shows the newest one at the display rate and polls the keyboard. Keys go
+# back through key_events, so capture and inference never wait on the window system.
+present_lock = threading.Lock()
+present_slot = None # Latest (frame, capture_time) not yet shown; older ones are replaced
+present_stop = threading.Event() # Set once the present stage has stopped, for any reason
+key_events = queue.Queue()
+
+def submit_frame(frame, capture_time):
+    """Puts a finished frame in the mailbox. The caller must not modify it afterwards.
+
+    Pass capture_time=None for frames whose display latency shouldn't be recorded.
+    """
+    global present_slot
+    with present_lock:
+        present_slot = (frame, capture_time)
+
+def present_loop(game_thread):
+    """Shows mailbox frames paced to DISPLAY_REFRESH_HZ and forwards key presses.
+
+    Must run on the main thread. Returns when game_thread finishes; if it raises
+    (e.g. imshow without a display), present_stop still tells the game loop to quit.
+    """
+    global present_slot
+    frame_interval = 1.0 / DISPLAY_REFRESH_HZ
+    # waitKey only sleeps once a window exists (Qt returns at once otherwise), so create it up front
+    cv2.namedWindow(WINDOW_NAME)
+    next_present = time.monotonic()
+    try:
+        while game_thread.is_alive():
+            with present_lock:
+                item = present_slot
+                present_slot = None
+            if item is not None:
+                frame, capture_time = item
+                cv2.imshow(WINDOW_NAME, frame)
+                if capture_time is not None:
+                    record_latency(capture_to_display_latencies, capture_time)
+
+            # waitKey pumps window events and sleeps; it returns early on a key press,
+            # so keep waiting until the next refresh slot before showing another frame
+            next_present += frame_interval
+            while True:
+                wait_ms = max(1, int((next_present - time.monotonic()) * 1000))
+                key = cv2.waitKey(wait_ms) & 0xFF
+                if key != NO_KEY:
+                    key_events.put(key)
+                if time.monotonic() >= next_present:
+                    break
+
+            now = time.monotonic()
+            if next_present < now - frame_interval: # Fell behind (e.g. slow imshow), don't try to catch up
+                next_present = now
+    finally:
+        present_stop.set()
+
+def poll_key():
+    """Returns the next queued key press, or NO_KEY if there is none."""
+    try:
+        return key_events.get_nowait()
+    except queue.Empty:
+        return NO_KEY
+
+def wait_key():
+    """Blocks until a key is pressed. Returns ord('q') if the present stage has stopped."""
+    while not present_stop.is_set():
+        try:
+            return key_events.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return ord('q')
+
 # --- Helper Functions ---
 def draw_text(img, text, pos, scale=1, color=(255, 255, 255), thickness=2):
     cv2.putText(img, text, pos, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness, cv2.LINE_AA)
@@ -218,6 +397,23 @@ def overlay_transparent(background, overlay, x, y):
     background[y1:y2, x1:x2] = roi
     return background
 
+# Helper to blend one premultiplied sprite (see build_face_atlas) onto the frame
+def blend_sprite(background, color, alpha_inv, x, y):
+    h, w = color.shape[:2]
+    bg_h, bg_w = background.shape[:2]
+
+    x1, x2 = max(0, x), min(bg_w, x + w)
+    y1, y2 = max(0, y), min(bg_h, y + h)
+    if (y2 - y1) <= 0 or (x2 - x1) <= 0:
+        return background # No overlap
+
+    sx, sy = x1 - x, y1 - y
+    roi = background[y1:y2, x1:x2]
+    blended = color[sy:sy + (y2 - y1), sx:sx + (x2 - x1)] + \
+              alpha_inv[sy:sy + (y2 - y1), sx:sx + (x2 - x1)] * roi
+    background[y1:y2, x1:x2] = blended.astype(np.uint8)
+    return background
+
 # Helper for Circle-Rectangle Intersection (Using this again)
 def check_circle_rect_collision(circle_center, circle_radius, rect_x, rect_y, rect_w, rect_h):
     if circle_center is None:
@@ -268,16 +464,28 @@ def intersect(p1, q1, p2, q2):
     return False # Doesn't intersect
 # --- End New Helpers ---
 
-def move_target(width, height):
-    """Moves the target to a new random location."""
-    global target_rect
-    # Ensure target stays fully within screen bounds
+def build_target_schedule(width, height, seed, count):
+    """Generates count reproducible target positions that keep the target fully on screen."""
+    rng = random.Random(seed)
     max_x = width - target_size
     max_y = height - target_size
-    new_x = random.randint(0, max_x)
-    new_y = random.randint(0, max_y)
+    return [(rng.randint(0, max_x), rng.randint(0, max_y)) for _ in range(count)]
+
+def start_target_schedule(width, height):
+    """Pre-generates this round's target positions from a fixed or fresh seed."""
+    global target_schedule, target_schedule_index, round_seed
+    round_seed = TARGET_SEED if TARGET_SEED is not None else random.randrange(2**32)
+    count = max(1, selected_duration * MAX_HITS_PER_SECOND)
+    target_schedule = build_target_schedule(width, height, round_seed, count)
+    target_schedule_index = 0
+    print(f"Target schedule seed: {round_seed} ({count} positions)")
+
+def move_target():
+    """Moves the target to the next position in the round's schedule."""
+    global target_rect, target_schedule_index
+    new_x, new_y = target_schedule[target_schedule_index % len(target_schedule)]
+    target_schedule_index += 1
     target_rect = (new_x, new_y, target_size, target_size)
-    print(f"Target moved to: ({new_x}, {new_y})")
 
 # --- State Reset/Setup (Modified) ---
 def setup_state(new_state, duration=0):
@@ -294,6 +502,7 @@ def setup_state(new_state, duration=0):
     if new_state == STATE_SHOW_RESULTS:
         final_score = punch_count
         print(f"Time's up! Final Score: {final_score}")
+        report_all_latencies()
         # Check if it qualifies for high score list
         duration_key = str(selected_duration)
         score_list = high_scores.get(duration_key, [])
@@ -310,11 +519,13 @@ def setup_state(new_state, duration=0):
     elif new_state == STATE_COUNTDOWN:
         punch_count = 0
         selected_duration = duration # Store selected duration
-        start_time = time.time()
+        start_time = None # Anchored to the capture stamp of the round's first frame
+        capture_to_hit_latencies.clear() # Latency report covers this round only
+        capture_to_display_latencies.clear()
         remaining_time = selected_duration
         prev_avg_pos = [None, None]
         current_avg_pos = [None, None]
-        last_punch_time = [0, 0]
+        last_punch_time = [float('-inf'), float('-inf')]
         target_rect = None # Ensure target resets position
         current_round_hits = 0 # Reset round hits
         target_damage_stage = 1 # Reset damage stage
@@ -339,7 +550,7 @@ def setup_state(new_state, duration=0):
     current_state = new_state
     prev_avg_pos = [None, None]
     current_avg_pos = [None, None]
-    last_punch_time = [0, 0]
+    last_punch_time = [float('-inf'), float('-inf')]
     target_rect = None
     current_round_hits = 0 # Reset round hits
     target_damage_stage = 1 # Reset damage stage
@@ -349,371 +560,395 @@ high_scores = load_high_scores()
 # Start in Title Screen state directly
 setup_state(STATE_TITLE_SCREEN)
 print("VibeBoxing. Press 'q' to quit.")
+capture_thread = threading.Thread(target=capture_loop, name="capture", daemon=True)
+capture_thread.start()
 
 # --- Main Loop ---
-while True:
-    success, frame = cap.read()
-    if not success:
-        print("Ignoring empty camera frame.")
-        continue
-
-    frame = cv2.flip(frame, 1)
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    height, width, _ = frame.shape
-
-    # Define target rectangle on first frame of countdown state
-    if current_state == STATE_COUNTDOWN and target_rect is None:
-        move_target(width, height)
-
-    # --- State Handling ---
-    # Process key input non-blockingly for most states
-    key = -1
-    if current_state not in [STATE_SHOW_RESULTS, STATE_GET_NAME]: # Don't wait in results/name entry initially
-        key = cv2.waitKey(5) & 0xFF
-
-    if key == ord('q'):
-        break
-
-    # --- TITLE SCREEN State ---
-    if current_state == STATE_TITLE_SCREEN:
-        # Draw Logo
-        if logo_img_resized is not None:
-            logo_x = (width - logo_img_resized.shape[1]) // 2
-            logo_y = height // 4 # Position near top
-            frame = overlay_transparent(frame, logo_img_resized, logo_x, logo_y)
-        else:
-            draw_text(frame, "VibeBoxing", (width // 2 - 150, height // 3), 2)
-
-        # Draw Buttons (Adjust Y positions and Colors)
-        button_y_start = logo_y + logo_h + 60
-        start_color = (64, 198, 251) # BGR for #FBC640
-        leaderboard_color = (64, 198, 251) # BGR for #FBC640
-        draw_text(frame, "Start Game (S)", (width // 2 - 150, button_y_start), 1.2, start_color)
-        draw_text(frame, "Leaderboard (L)", (width // 2 - 170, button_y_start + 60), 1.2, leaderboard_color)
-
-        if key == ord('s'):
-            setup_state(STATE_SELECT_TIME)
-        elif key == ord('l'):
-            setup_state(STATE_LEADERBOARD)
-
-    # --- LEADERBOARD State ---
-    elif current_state == STATE_LEADERBOARD:
-        # Define layout parameters
-        column_width = int(width * 0.35) # Width of each column background
-        gap = int(width * 0.1)       # Gap between columns
-        total_content_width = 2 * column_width + gap
-        margin = (width - total_content_width) // 2
-
-        header_y = 100
-        lb_text_color = (0, 255, 255) # Yellow text
-        border_color = (255, 255, 255) # White border
-        border_thickness = 2
-
-        # --- Calculate Column Bounds ---
-        # Column 1 (30s)
-        lb1_x = margin
-        lb1_w = column_width
-        col1_x = lb1_x + 30 # Text start position inside column 1 (padding)
-
-        # Column 2 (60s)
-        lb2_x = margin + column_width + gap
-        lb2_w = column_width
-        col2_x = lb2_x + 30 # Text start position inside column 2 (padding)
-
-        # Common Y and Height
-        lb_y = header_y - 40 # Top margin
-        lb_h = header_y + (MAX_HIGH_SCORES * 40) + 20 - lb_y # Height
-
-        # --- Draw Backgrounds ---
-        overlay = frame.copy()
-        lb_bg_color = (0, 79, 139) # BGR for #8B4F00
-        alpha = 0.6 # Transparency factor
-        cv2.rectangle(overlay, (lb1_x, lb_y), (lb1_x + lb1_w, lb_y + lb_h), lb_bg_color, -1) # BG Col 1
-        cv2.rectangle(overlay, (lb2_x, lb_y), (lb2_x + lb2_w, lb_y + lb_h), lb_bg_color, -1) # BG Col 2
-        frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
-
-        # --- Draw Borders (AFTER blending background) ---
-        cv2.rectangle(frame, (lb1_x, lb_y), (lb1_x + lb1_w, lb_y + lb_h), border_color, border_thickness) # Border Col 1
-        cv2.rectangle(frame, (lb2_x, lb_y), (lb2_x + lb2_w, lb_y + lb_h), border_color, border_thickness) # Border Col 2
-
-        # --- Draw Text Content ---
-        # Headers
-        # Adjust header text position slightly to center better over text area
-        header1_x = col1_x + (lb1_w - 2*30) // 2 - int(cv2.getTextSize("30 Seconds", cv2.FONT_HERSHEY_SIMPLEX, 1.2, 2)[0][0] / 2)
-        header2_x = col2_x + (lb2_w - 2*30) // 2 - int(cv2.getTextSize("60 Seconds", cv2.FONT_HERSHEY_SIMPLEX, 1.2, 2)[0][0] / 2)
-        draw_text(frame, "30 Seconds", (header1_x, header_y), 1.2, lb_text_color)
-        draw_text(frame, "60 Seconds", (header2_x, header_y), 1.2, lb_text_color)
-
-        # Scores
-        y_offset = 60
-        for i in range(MAX_HIGH_SCORES):
-            # 30s column (using col1_x for text)
-            score_list_30 = high_scores.get('30', [])
-            if i < len(score_list_30):
-                entry = score_list_30[i]
-                text = f"{i+1}. {entry['name']} - {entry['score']}"
-                draw_text(frame, text, (col1_x, header_y + y_offset), 1, lb_text_color)
-            else:
-                text = f"{i+1}. ---"
-                draw_text(frame, text, (col1_x, header_y + y_offset), 1, (180, 180, 180))
-
-            # 60s column (using col2_x for text)
-            score_list_60 = high_scores.get('60', [])
-            if i < len(score_list_60):
-                entry = score_list_60[i]
-                text = f"{i+1}. {entry['name']} - {entry['score']}"
-                draw_text(frame, text, (col2_x, header_y + y_offset), 1, lb_text_color)
-            else:
-                text = f"{i+1}. ---"
-                draw_text(frame, text, (col2_x, header_y + y_offset), 1, (180, 180, 180))
-
-            y_offset += 40
-
-        # Draw Back button with yellow color
-        draw_text(frame, "Back (B)", (50, height - 50), 1, lb_text_color)
-        if key == ord('b'):
-            setup_state(STATE_TITLE_SCREEN)
-
-    # --- SELECT TIME State ---
-    elif current_state == STATE_SELECT_TIME:
-        # Draw the Select Duration image instead of text
-        if select_duration_img is not None:
-            # Resize only once or if window size changes (if that's handled)
-            # For simplicity, resize each time here based on current frame width
-            select_duration_w = int(width * select_duration_scale)
-            select_duration_h = int(select_duration_img.shape[0] * (select_duration_w / select_duration_img.shape[1]))
-            select_duration_img_resized = cv2.resize(select_duration_img, (select_duration_w, select_duration_h))
-
-            img_x = (width - select_duration_w) // 2
-            img_y = (height - select_duration_h) // 2 # Center vertically
-            frame = overlay_transparent(frame, select_duration_img_resized, img_x, img_y)
-        else:
-            # Fallback text if image failed to load
-            select_time_color = (0, 255, 255) # Yellow text
-            draw_text(frame, "Select Duration:", (width // 2 - 250, height // 2 - 100), 1.2, select_time_color)
-            y_offset = -20
-            for duration, key_char in TIME_OPTIONS.items():
-                text = f"({key_char}) {duration}s"
-                draw_text(frame, text, (width // 2 - 100, height // 2 + y_offset), 1, select_time_color)
-                y_offset += 60
-
-        if key in KEY_TO_DURATION:
-            setup_state(STATE_COUNTDOWN, duration=KEY_TO_DURATION[key])
-
-    # --- COUNTDOWN State ---
-    elif current_state == STATE_COUNTDOWN:
-        elapsed_time = time.time() - start_time
-        remaining_time = max(0, selected_duration - elapsed_time)
-
-        # --- Draw Target First ---
-        if target_rect:
-            tx, ty, tw, th = target_rect
-            # Select face image based on damage stage (adjust for 0-based index)
-            stage_index = max(0, target_damage_stage - 1)
-            img_to_draw = None
-            if stage_index < len(target_face_images) and target_face_images[stage_index] is not None:
-                 img_to_draw = target_face_images[stage_index]
-            else:
-                 # Fallback drawing
-                 for fallback_index in range(stage_index - 1, -2, -1):
-                     if fallback_index == -1:
-                          break
-                     if fallback_index < len(target_face_images) and target_face_images[fallback_index] is not None:
-                         img_to_draw = target_face_images[fallback_index]
-                         break
-
-            # Draw the selected face image or fallback rect
-            if img_to_draw is not None:
-                frame = overlay_transparent(frame, img_to_draw, tx, ty)
+def game_loop():
+    """Capture, inference and game logic; runs on a worker thread (see Present Stage)."""
+    global frame_capture_time, start_time, remaining_time, current_avg_pos
+    global punch_count, current_round_hits, target_damage_stage
+    global current_name_input, select_duration_img_resized
+    last_capture_sequence = 0
+
+    while True:
+        if present_stop.is_set(): # Window closed or present stage failed
+            break
+        captured = next_capture(last_capture_sequence)
+        if captured is None:
+            # No new frame: still honour quit, and stop if the capture stage died
+            if poll_key() == ord('q'):
+                break
+            if not capture_thread.is_alive():
+                print("Error: Camera capture stopped.")
+                break
+            continue
+        # Timing logic below uses the frame's capture stamp, not processing time
+        frame, frame_capture_time, last_capture_sequence = captured
+
+        frame = cv2.flip(frame, 1)
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        height, width, _ = frame.shape
+
+        # Define target rectangle on first frame of countdown state
+        if current_state == STATE_COUNTDOWN and start_time is None:
+            start_time = frame_capture_time
+        if current_state == STATE_COUNTDOWN and target_rect is None:
+            start_target_schedule(width, height)
+            move_target()
+
+        # --- State Handling ---
+        # Process key input non-blockingly for most states
+        key = NO_KEY
+        if current_state not in [STATE_SHOW_RESULTS, STATE_GET_NAME]: # Don't wait in results/name entry initially
+            key = poll_key()
+
+        if key == ord('q'):
+            break
+
+        # --- TITLE SCREEN State ---
+        if current_state == STATE_TITLE_SCREEN:
+            # Draw Logo
+            if logo_img_resized is not None:
+                logo_x = (width - logo_img_resized.shape[1]) // 2
+                logo_y = height // 4 # Position near top
+                frame = overlay_transparent(frame, logo_img_resized, logo_x, logo_y)
             else:
-                cv2.rectangle(frame, (tx, ty), (tx + tw, ty + th), (0, 0, 255), -1)
-
-        # --- Hand Detection & Glove Drawing (AFTER Target) ---
-        results = hands.process(frame_rgb)
-        prev_avg_pos[0] = current_avg_pos[0]
-        prev_avg_pos[1] = current_avg_pos[1]
-        current_avg_pos = [None, None]
-
-        if results and results.multi_hand_landmarks:
-            for hand_idx, hand_landmarks in enumerate(results.multi_hand_landmarks[:2]):
-                # Determine Handedness (Left/Right)
-                hand_label = 'Unknown'
-                if results.multi_handedness and hand_idx < len(results.multi_handedness):
-                    hand_label = results.multi_handedness[hand_idx].classification[0].label
-
-                # Get landmarks for fist calculation (MCP joints)
-                landmarks_for_fist = [
-                    mp_hands.HandLandmark.INDEX_FINGER_MCP,
-                    mp_hands.HandLandmark.MIDDLE_FINGER_MCP,
-                    mp_hands.HandLandmark.RING_FINGER_MCP,
-                    mp_hands.HandLandmark.PINKY_MCP
-                ]
-                fist_points = []
-                valid_points = True
-                for lm_idx in landmarks_for_fist:
-                    lm = hand_landmarks.landmark[lm_idx]
-                    if lm:
-                         fist_points.append((int(lm.x * width), int(lm.y * height)))
-                    else:
-                         valid_points = False
-                         break
-
-                # Calculate average position
-                avg_pos_this_hand = None
-                if valid_points and len(fist_points) > 0:
-                    avg_x = int(np.mean([p[0] for p in fist_points]))
-                    avg_y = int(np.mean([p[1] for p in fist_points]))
-                    avg_pos_this_hand = (avg_x, avg_y)
+                draw_text(frame, "VibeBoxing", (width // 2 - 150, height // 3), 2)
+
+            # Draw Buttons (Adjust Y positions and Colors)
+            button_y_start = logo_y + logo_h + 60
+            start_color = (64, 198, 251) # BGR for #FBC640
+            leaderboard_color = (64, 198, 251) # BGR for #FBC640
+            draw_text(frame, "Start Game (S)", (width // 2 - 150, button_y_start), 1.2, start_color)
+            draw_text(frame, "Leaderboard (L)", (width // 2 - 170, button_y_start + 60), 1.2, leaderboard_color)
+
+            if key == ord('s'):
+                setup_state(STATE_SELECT_TIME)
+            elif key == ord('l'):
+                setup_state(STATE_LEADERBOARD)
+
+        # --- LEADERBOARD State ---
+        elif current_state == STATE_LEADERBOARD:
+            # Define layout parameters
+            column_width = int(width * 0.35) # Width of each column background
+            gap = int(width * 0.1)       # Gap between columns
+            total_content_width = 2 * column_width + gap
+            margin = (width - total_content_width) // 2
+
+            header_y = 100
+            lb_text_color = (0, 255, 255) # Yellow text
+            border_color = (255, 255, 255) # White border
+            border_thickness = 2
+
+            # --- Calculate Column Bounds ---
+            # Column 1 (30s)
+            lb1_x = margin
+            lb1_w = column_width
+            col1_x = lb1_x + 30 # Text start position inside column 1 (padding)
+
+            # Column 2 (60s)
+            lb2_x = margin + column_width + gap
+            lb2_w = column_width
+            col2_x = lb2_x + 30 # Text start position inside column 2 (padding)
+
+            # Common Y and Height
+            lb_y = header_y - 40 # Top margin
+            lb_h = header_y + (MAX_HIGH_SCORES * 40) + 20 - lb_y # Height
+
+            # --- Draw Backgrounds ---
+            overlay = frame.copy()
+            lb_bg_color = (0, 79, 139) # BGR for #8B4F00
+            alpha = 0.6 # Transparency factor
+            cv2.rectangle(overlay, (lb1_x, lb_y), (lb1_x + lb1_w, lb_y + lb_h), lb_bg_color, -1) # BG Col 1
+            cv2.rectangle(overlay, (lb2_x, lb_y), (lb2_x + lb2_w, lb_y + lb_h), lb_bg_color, -1) # BG Col 2
+            frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
+
+            # --- Draw Borders (AFTER blending background) ---
+            cv2.rectangle(frame, (lb1_x, lb_y), (lb1_x + lb1_w, lb_y + lb_h), border_color, border_thickness) # Border Col 1
+            cv2.rectangle(frame, (lb2_x, lb_y), (lb2_x + lb2_w, lb_y + lb_h), border_color, border_thickness) # Border Col 2
+
+            # --- Draw Text Content ---
+            # Headers
+            # Adjust header text position slightly to center better over text area
+            header1_x = col1_x + (lb1_w - 2*30) // 2 - int(cv2.getTextSize("30 Seconds", cv2.FONT_HERSHEY_SIMPLEX, 1.2, 2)[0][0] / 2)
+            header2_x = col2_x + (lb2_w - 2*30) // 2 - int(cv2.getTextSize("60 Seconds", cv2.FONT_HERSHEY_SIMPLEX, 1.2, 2)[0][0] / 2)
+            draw_text(frame, "30 Seconds", (header1_x, header_y), 1.2, lb_text_color)
+            draw_text(frame, "60 Seconds", (header2_x, header_y), 1.2, lb_text_color)
+
+            # Scores
+            y_offset = 60
+            for i in range(MAX_HIGH_SCORES):
+                # 30s column (using col1_x for text)
+                score_list_30 = high_scores.get('30', [])
+                if i < len(score_list_30):
+                    entry = score_list_30[i]
+                    text = f"{i+1}. {entry['name']} - {entry['score']}"
+                    draw_text(frame, text, (col1_x, header_y + y_offset), 1, lb_text_color)
                 else:
-                    # Fallback if points missing
-                    middle_knuckle = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
-                    if middle_knuckle:
-                        cx_hit, cy_hit = int(middle_knuckle.x * width), int(middle_knuckle.y * height)
-                        avg_pos_this_hand = (cx_hit, cy_hit) # Use middle knuckle as fallback avg
-
-                # Assign position and draw glove based on handedness
-                if avg_pos_this_hand is not None:
-                    glove_to_draw = None
-                    # Remember: Frame is flipped, so user's Right hand is on the Left screen side
-                    if hand_label == 'Right':
-                        current_avg_pos[0] = avg_pos_this_hand # Index 0 for Right Hand
-                        glove_to_draw = right_glove_img
-                    elif hand_label == 'Left':
-                        current_avg_pos[1] = avg_pos_this_hand # Index 1 for Left Hand
-                        glove_to_draw = left_glove_img
-
-                    # Draw the selected glove or fallback circle
-                    if glove_to_draw is not None:
-                        glove_x = avg_pos_this_hand[0] - glove_size // 2
-                        glove_y = avg_pos_this_hand[1] - glove_size // 2
-                        frame = overlay_transparent(frame, glove_to_draw, glove_x, glove_y)
-                    else:
-                        # Fallback circle if glove image missing or hand unknown
-                        cv2.circle(frame, avg_pos_this_hand, fist_visual_radius, (255, 0, 0), cv2.FILLED)
-
-        # --- Target Hit Detection & Movement (Forgiving Circle Collision) ---
-        if target_rect: # Ensure target exists
-            tx, ty, tw, th = target_rect
-            current_time = time.time()
-            for i in range(2):
-                # Check cooldown and if current avg pos is valid
-                if current_avg_pos[i] and \
-                   (current_time - last_punch_time[i] > punch_cooldown):
-
-                    # Use circle-rect collision with the LARGER collision radius
-                    collision = check_circle_rect_collision(current_avg_pos[i], fist_collision_radius, tx, ty, tw, th)
-
-                    if collision:
-                        print(f"Target hit by hand {i} (Forgiving Collision)!")
-                        punch_count += 1
-                        current_round_hits += 1 # Increment round hits
-                        last_punch_time[i] = current_time # Mark hit time for cooldown
-
-                        # Update damage stage (every 5 hits, cap at 6)
-                        new_stage = min(6, 1 + current_round_hits // 5)
-                        if new_stage != target_damage_stage:
-                            target_damage_stage = new_stage
-                            print(f"Target entering damage stage {target_damage_stage}")
-
-                        move_target(width, height) # Move target immediately
-                        break # Only one hit per frame moves the target
-
-        # --- Display HUD ---
-        draw_text(frame, f"Time: {remaining_time:.1f}s", (10, 40), 1.2)
-        draw_text(frame, f"Targets Hit: {punch_count}", (width - 300, 40), 1.2) # Updated label
-
-        # --- Check for Time Up ---
-        if remaining_time <= 0:
-            setup_state(STATE_SHOW_RESULTS)
-
-    # --- SHOW RESULTS State ---
-    elif current_state == STATE_SHOW_RESULTS:
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (width, height), (0, 0, 0), -1)
-        alpha = 0.7
-        frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
-
-        draw_text(frame, "Time's Up!", (width // 2 - 150, height // 2 - 120), 2, (0, 165, 255))
-        draw_text(frame, f"Score: {final_score}", (width // 2 - 180, height // 2 - 40), 1.5)
-        current_high = 0
-        if str(selected_duration) in high_scores:
-             score_list = high_scores[str(selected_duration)]
-             if score_list: # Check if list not empty
-                 current_high = score_list[0]['score'] # Highest is first
-        draw_text(frame, f"High Score ({selected_duration}s): {current_high}", (width // 2 - 220, height // 2 + 10), 1.2)
-
-        if new_high_score_achieved:
-            draw_text(frame, "NEW HIGH SCORE!", (width // 2 - 200, height // 2 + 60), 1.2, (0, 255, 0))
-            draw_text(frame, "Press Enter to Save / (R) Restart", (width // 2 - 290, height // 2 + 110), 1)
-        else:
-            draw_text(frame, "Press Enter to Continue / (R) Restart", (width // 2 - 310, height // 2 + 110), 1)
+                    text = f"{i+1}. ---"
+                    draw_text(frame, text, (col1_x, header_y + y_offset), 1, (180, 180, 180))
+
+                # 60s column (using col2_x for text)
+                score_list_60 = high_scores.get('60', [])
+                if i < len(score_list_60):
+                    entry = score_list_60[i]
+                    text = f"{i+1}. {entry['name']} - {entry['score']}"
+                    draw_text(frame, text, (col2_x, header_y + y_offset), 1, lb_text_color)
+                else:
+                    text = f"{i+1}. ---"
+                    draw_text(frame, text, (col2_x, header_y + y_offset), 1, (180, 180, 180))
+
+                y_offset += 40
 
-        # Display the frame *before* blocking waitKey
-        cv2.imshow('VibeBoxing Target Practice', frame)
+            # Draw Back button with yellow color
+            draw_text(frame, "Back (B)", (50, height - 50), 1, lb_text_color)
+            if key == ord('b'):
+                setup_state(STATE_TITLE_SCREEN)
 
-        # Wait for Enter key press (using blocking waitKey again)
-        key = cv2.waitKey(0) & 0xFF # BLOCKING - wait here until key pressed
+        # --- SELECT TIME State ---
+        elif current_state == STATE_SELECT_TIME:
+            # Draw the Select Duration image instead of text
+            if select_duration_img is not None:
+                # Resize only once or if window size changes (if that's handled)
+                # For simplicity, resize each time here based on current frame width
+                select_duration_w = int(width * select_duration_scale)
+                select_duration_h = int(select_duration_img.shape[0] * (select_duration_w / select_duration_img.shape[1]))
+                select_duration_img_resized = cv2.resize(select_duration_img, (select_duration_w, select_duration_h))
+
+                img_x = (width - select_duration_w) // 2
+                img_y = (height - select_duration_h) // 2 # Center vertically
+                frame = overlay_transparent(frame, select_duration_img_resized, img_x, img_y)
+            else:
+                # Fallback text if image failed to load
+                select_time_color = (0, 255, 255) # Yellow text
+                draw_text(frame, "Select Duration:", (width // 2 - 250, height // 2 - 100), 1.2, select_time_color)
+                y_offset = -20
+                for duration, key_char in TIME_OPTIONS.items():
+                    text = f"({key_char}) {duration}s"
+                    draw_text(frame, text, (width // 2 - 100, height // 2 + y_offset), 1, select_time_color)
+                    y_offset += 60
+
+            if key in KEY_TO_DURATION:
+                setup_state(STATE_COUNTDOWN, duration=KEY_TO_DURATION[key])
+
+        # --- COUNTDOWN State ---
+        elif current_state == STATE_COUNTDOWN:
+            elapsed_time = frame_capture_time - start_time
+            remaining_time = max(0, selected_duration - elapsed_time)
+
+            # --- Draw Target First ---
+            if target_rect:
+                tx, ty, tw, th = target_rect
+                # Select face sprite based on damage stage (adjust for 0-based index)
+                stage_index = min(max(0, target_damage_stage - 1), len(face_atlas_color) - 1)
+                frame = blend_sprite(frame, face_atlas_color[stage_index], face_atlas_alpha_inv[stage_index], tx, ty)
+
+            # --- Hand Detection & Glove Drawing (AFTER Target) ---
+            results = hands.process(frame_rgb)
+            prev_avg_pos[0] = current_avg_pos[0]
+            prev_avg_pos[1] = current_avg_pos[1]
+            current_avg_pos = [None, None]
+
+            if results and results.multi_hand_landmarks:
+                for hand_idx, hand_landmarks in enumerate(results.multi_hand_landmarks[:2]):
+                    # Determine Handedness (Left/Right)
+                    hand_label = 'Unknown'
+                    if results.multi_handedness and hand_idx < len(results.multi_handedness):
+                        hand_label = results.multi_handedness[hand_idx].classification[0].label
+
+                    # Get landmarks for fist calculation (MCP joints)
+                    landmarks_for_fist = [
+                        mp_hands.HandLandmark.INDEX_FINGER_MCP,
+                        mp_hands.HandLandmark.MIDDLE_FINGER_MCP,
+                        mp_hands.HandLandmark.RING_FINGER_MCP,
+                        mp_hands.HandLandmark.PINKY_MCP
+                    ]
+                    fist_points = []
+                    valid_points = True
+                    for lm_idx in landmarks_for_fist:
+                        lm = hand_landmarks.landmark[lm_idx]
+                        if lm:
+                             fist_points.append((int(lm.x * width), int(lm.y * height)))
+                        else:
+                             valid_points = False
+                             break
+
+                    # Calculate average position
+                    avg_pos_this_hand = None
+                    if valid_points and len(fist_points) > 0:
+                        avg_x = int(np.mean([p[0] for p in fist_points]))
+                        avg_y = int(np.mean([p[1] for p in fist_points]))
+                        avg_pos_this_hand = (avg_x, avg_y)
+                    else:
+                        # Fallback if points missing
+                        middle_knuckle = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
+                        if middle_knuckle:
+                            cx_hit, cy_hit = int(middle_knuckle.x * width), int(middle_knuckle.y * height)
+                            avg_pos_this_hand = (cx_hit, cy_hit) # Use middle knuckle as fallback avg
+
+                    # Assign position and draw glove based on handedness
+                    if avg_pos_this_hand is not None:
+                        glove_to_draw = None
+                        # Remember: Frame is flipped, so user's Right hand is on the Left screen side
+                        if hand_label == 'Right':
+                            current_avg_pos[0] = avg_pos_this_hand # Index 0 for Right Hand
+                            glove_to_draw = right_glove_img
+                        elif hand_label == 'Left':
+                            current_avg_pos[1] = avg_pos_this_hand # Index 1 for Left Hand
+                            glove_to_draw = left_glove_img
+
+                        # Draw the selected glove or fallback circle
+                        if glove_to_draw is not None:
+                            glove_x = avg_pos_this_hand[0] - glove_size // 2
+                            glove_y = avg_pos_this_hand[1] - glove_size // 2
+                            frame = overlay_transparent(frame, glove_to_draw, glove_x, glove_y)
+                        else:
+                            # Fallback circle if glove image missing or hand unknown
+                            cv2.circle(frame, avg_pos_this_hand, fist_visual_radius, (255, 0, 0), cv2.FILLED)
+
+            # --- Target Hit Detection & Movement (Forgiving Circle Collision) ---
+            # Frames captured after the round ended don't score, however late they're processed
+            if target_rect and remaining_time > 0: # Ensure target exists
+                tx, ty, tw, th = target_rect
+                for i in range(2):
+                    # Check cooldown (against capture time) and if current avg pos is valid
+                    if current_avg_pos[i] and \
+                       (frame_capture_time - last_punch_time[i] > punch_cooldown):
+
+                        # Use circle-rect collision with the LARGER collision radius
+                        collision = check_circle_rect_collision(current_avg_pos[i], fist_collision_radius, tx, ty, tw, th)
+
+                        if collision:
+                            print(f"Target hit by hand {i} (Forgiving Collision)!")
+                            punch_count += 1
+                            current_round_hits += 1 # Increment round hits
+                            last_punch_time[i] = frame_capture_time # Mark hit time for cooldown
+                            record_latency(capture_to_hit_latencies, frame_capture_time)
+
+                            # Update damage stage (every 5 hits, cap at 6)
+                            new_stage = min(6, 1 + current_round_hits // 5)
+                            if new_stage != target_damage_stage:
+                                target_damage_stage = new_stage
+                                print(f"Target entering damage stage {target_damage_stage}")
+
+                            move_target() # Move target immediately
+                            break # Only one hit per frame moves the target
+
+            # --- Display HUD ---
+            draw_text(frame, f"Time: {remaining_time:.1f}s", (10, 40), 1.2)
+            draw_text(frame, f"Targets Hit: {punch_count}", (width - 300, 40), 1.2) # Updated label
+
+            # --- Check for Time Up ---
+            if remaining_time <= 0:
+                setup_state(STATE_SHOW_RESULTS)
+
+        # --- SHOW RESULTS State ---
+        elif current_state == STATE_SHOW_RESULTS:
+            overlay = frame.copy()
+            cv2.rectangle(overlay, (0, 0), (width, height), (0, 0, 0), -1)
+            alpha = 0.7
+            frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
+
+            draw_text(frame, "Time's Up!", (width // 2 - 150, height // 2 - 120), 2, (0, 165, 255))
+            draw_text(frame, f"Score: {final_score}", (width // 2 - 180, height // 2 - 40), 1.5)
+            current_high = 0
+            if str(selected_duration) in high_scores:
+                 score_list = high_scores[str(selected_duration)]
+                 if score_list: # Check if list not empty
+                     current_high = score_list[0]['score'] # Highest is first
+            draw_text(frame, f"High Score ({selected_duration}s): {current_high}", (width // 2 - 220, height // 2 + 10), 1.2)
+            if round_seed is not None:
+                # Replay this round's targets with VIBEBOXING_TARGET_SEED=<seed>
+                draw_text(frame, f"Target Seed: {round_seed}", (10, height - 20), 0.6, (180, 180, 180), 1)
 
-        if key == 13: # ASCII for Enter
             if new_high_score_achieved:
-                setup_state(STATE_GET_NAME)
-            else:
-                setup_state(STATE_TITLE_SCREEN)
-        elif key == ord('r'): # Restart same duration
-            setup_state(STATE_COUNTDOWN, duration=selected_duration)
-        elif key == ord('q'): # Allow quit from results screen
-             break
-
-    # --- GET NAME State ---
-    elif current_state == STATE_GET_NAME:
-        # Draw prompt
-        draw_text(frame, "New High Score!", (width // 2 - 220, height // 2 - 100), 1.5, (0, 255, 0))
-        draw_text(frame, f"Score: {final_score}", (width // 2 - 150, height // 2 - 40), 1.2)
-        prompt_text = f"Enter Name: {current_name_input}"
-        # Add simple blinking cursor effect (optional)
-        if int(time.time() * 2) % 2 == 0:
-            prompt_text += "_"
-        draw_text(frame, prompt_text, (width // 2 - 250, height // 2 + 20), 1.2)
-        draw_text(frame, f"({len(current_name_input)}/{MAX_NAME_LENGTH} chars, Enter to save)", (width // 2 - 250, height // 2 + 70), 0.8)
-
-        # Display frame *before* blocking waitKey
-        cv2.imshow('VibeBoxing Target Practice', frame)
-
-        # Get keyboard input (blocking waitKey needed here)
-        name_key = cv2.waitKey(0) & 0xFF
-
-        if name_key == 13: # Enter key
-            if len(current_name_input) > 0:
-                # Add to high scores
-                duration_key = str(selected_duration)
-                new_entry = {"name": current_name_input, "score": final_score}
-                score_list = high_scores.get(duration_key, [])
-                score_list.append(new_entry)
-                score_list.sort(key=lambda x: x['score'], reverse=True)
-                high_scores[duration_key] = score_list[:MAX_HIGH_SCORES] # Keep top N
-                save_high_scores(high_scores)
-                setup_state(STATE_LEADERBOARD) # Go to leaderboard after saving
+                draw_text(frame, "NEW HIGH SCORE!", (width // 2 - 200, height // 2 + 60), 1.2, (0, 255, 0))
+                draw_text(frame, "Press Enter to Save / (R) Restart", (width // 2 - 290, height // 2 + 110), 1)
             else:
-                print("Name cannot be empty. Returning to title.")
-                setup_state(STATE_TITLE_SCREEN)
+                draw_text(frame, "Press Enter to Continue / (R) Restart", (width // 2 - 310, height // 2 + 110), 1)
+
+            # Display the frame *before* blocking on the key queue
+            submit_frame(frame, None)
+
+            # Wait for Enter key press from the present stage
+            key = wait_key() # BLOCKING - wait here until key pressed
 
-        elif name_key == 8: # Backspace
-            current_name_input = current_name_input[:-1]
-        elif 32 <= name_key <= 126: # Printable ASCII characters
-            if len(current_name_input) < MAX_NAME_LENGTH:
-                current_name_input += chr(name_key)
-        elif name_key == ord('q'): # Allow quit from name entry too
-             break
-
-    # --- Display Frame (for non-blocking states) ---
-    # We need to display the frame outside the blocking states too
-    if current_state not in [STATE_SHOW_RESULTS, STATE_GET_NAME]:
-        cv2.imshow('VibeBoxing Target Practice', frame)
-
-    # Break condition moved inside states where applicable
-
-# --- Cleanup ---
-cap.release()
-cv2.destroyAllWindows()
-hands.close()
-print("Application exited.") 
\ No newline at end of file
+            if key == 13: # ASCII for Enter
+                if new_high_score_achieved:
+                    setup_state(STATE_GET_NAME)
+                else:
+                    setup_state(STATE_TITLE_SCREEN)
+            elif key == ord('r'): # Restart same duration
+                setup_state(STATE_COUNTDOWN, duration=selected_duration)
+            elif key == ord('q'): # Allow quit from results screen
+                 break
+
+        # --- GET NAME State ---
+        elif current_state == STATE_GET_NAME:
+            # Draw prompt
+            draw_text(frame, "New High Score!", (width // 2 - 220, height // 2 - 100), 1.5, (0, 255, 0))
+            draw_text(frame, f"Score: {final_score}", (width // 2 - 150, height // 2 - 40), 1.2)
+            prompt_text = f"Enter Name: {current_name_input}"
+            # Add simple blinking cursor effect (optional)
+            if int(time.time() * 2) % 2 == 0:
+                prompt_text += "_"
+            draw_text(frame, prompt_text, (width // 2 - 250, height // 2 + 20), 1.2)
+            draw_text(frame, f"({len(current_name_input)}/{MAX_NAME_LENGTH} chars, Enter to save)", (width // 2 - 250, height // 2 + 70), 0.8)
+
+            # Display frame *before* blocking on the key queue
+            submit_frame(frame, None)
+
+            # Get keyboard input (blocking get needed here)
+            name_key = wait_key()
+
+            if name_key == 13: # Enter key
+                if len(current_name_input) > 0:
+                    # Add to high scores
+                    duration_key = str(selected_duration)
+                    new_entry = {"name": current_name_input, "score": final_score}
+                    score_list = high_scores.get(duration_key, [])
+                    score_list.append(new_entry)
+                    score_list.sort(key=lambda x: x['score'], reverse=True)
+                    high_scores[duration_key] = score_list[:MAX_HIGH_SCORES] # Keep top N
+                    save_high_scores(high_scores)
+                    setup_state(STATE_LEADERBOARD) # Go to leaderboard after saving
+                else:
+                    print("Name cannot be empty. Returning to title.")
+                    setup_state(STATE_TITLE_SCREEN)
+
+            elif name_key == 8: # Backspace
+                current_name_input = current_name_input[:-1]
+            elif 32 <= name_key <= 126: # Printable ASCII characters
+                if len(current_name_input) < MAX_NAME_LENGTH:
+                    current_name_input += chr(name_key)
+            elif name_key == ord('q'): # Allow quit from name entry too
+                 break
+
+        # --- Display Frame (for non-blocking states) ---
+        # We need to display the frame outside the blocking states too
+        if current_state not in [STATE_SHOW_RESULTS, STATE_GET_NAME]:
+            # Display latency is only tracked for gameplay frames, not menus
+            submit_frame(frame, frame_capture_time if current_state == STATE_COUNTDOWN else None)
+
+        # Break condition moved inside states where applicable
+
+# HighGUI (imshow/waitKey) must stay on the main thread for the Cocoa and Qt backends,
+# so the present stage runs here and the game loop runs on a worker thread.
+game_thread = threading.Thread(target=game_loop, name="game", daemon=True)
+game_thread.start()
+try:
+    present_loop(game_thread)
+finally:
+    # --- Cleanup ---
+    present_stop.set()
+    game_thread.join(timeout=2.0)
+    cv2.destroyAllWindows()
+    capture_stop.set()
+    capture_thread.join(timeout=2.0)
+    cap.release()
+    hands.close()
+    if current_state == STATE_COUNTDOWN: # Quit mid-round; finished rounds were already reported
+        report_all_latencies()
+    print("Application exited.")
+ 
\ No newline at end of file